@@ -42,5 +42,5 @@ def filter_arealocations_by_access(request, queryset):
 
 def get_visible_areas(request):
     areas = [':full' if request.c3nav_full_access else ':base']
-    areas += [name for name in get_maybe_invisible_areas_names() if name in request.c3nav_access_list]
+    areas += [name for name in get_maybe_invisible_areas_names() if name in request.c3nav_access_set]
     return areas
@@ -38,6 +38,8 @@ class AccessTokenMiddleware:
                 request.c3nav_full_access = request.c3nav_access.full_access
                 request.c3nav_access_list = request.c3nav_access.permissions_list
 
+        request.c3nav_access_set = frozenset(request.c3nav_access_list)
+
         response = self.get_response(request)
 
         if request.c3nav_access is not None:
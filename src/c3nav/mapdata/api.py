@@ -1,9 +1,11 @@
 import mimetypes
 import os
 from collections import OrderedDict
+from functools import partial
 
 from django.conf import settings
 from django.core.files import File
+from django.db.models import Count
 from django.http import Http404, HttpResponse
 from rest_framework.decorators import detail_route
 from rest_framework.response import Response
@@ -11,11 +13,11 @@ from rest_framework.viewsets import ReadOnlyModelViewSet, ViewSet
 
 from c3nav.access.apply import filter_arealocations_by_access, filter_queryset_by_access, get_unlocked_packages_names
 from c3nav.mapdata.models import GEOMETRY_MAPITEM_TYPES, AreaLocation, Level, LocationGroup, Package, Source
-from c3nav.mapdata.models.geometry import DirectedLineGeometryMapItemWithLevel
 from c3nav.mapdata.search import get_location
 from c3nav.mapdata.serializers.main import LevelSerializer, PackageSerializer, SourceSerializer
 from c3nav.mapdata.utils.cache import (CachedReadOnlyViewSetMixin, cache_mapdata_api_response, get_levels_cached,
                                        get_packages_cached)
+from c3nav.mapdata.utils.misc import get_geometry_features
 
 
 class GeometryTypeViewSet(ViewSet):
@@ -74,39 +76,8 @@ class GeometryViewSet(ViewSet):
 
     @cache_mapdata_api_response()
     def _list(self, request, types, level, packages):
-        results = []
-        for t in types:
-            mapitemtype = GEOMETRY_MAPITEM_TYPES[t]
-            queryset = mapitemtype.objects.all()
-            if packages:
-                queryset = queryset.filter(package__in=packages)
-            if level:
-                if hasattr(mapitemtype, 'level'):
-                    queryset = queryset.filter(level=level)
-                elif hasattr(mapitemtype, 'levels'):
-                    queryset = queryset.filter(levels=level)
-                else:
-                    queryset = queryset.none()
-            queryset = filter_queryset_by_access(request, queryset)
-            queryset = queryset.order_by('name')
-
-            for field_name in ('package', 'level', 'crop_to_level', 'elevator'):
-                if hasattr(mapitemtype, field_name):
-                    queryset = queryset.select_related(field_name)
-
-            for field_name in ('levels', ):
-                if hasattr(mapitemtype, field_name):
-                    queryset.prefetch_related(field_name)
-
-            if issubclass(mapitemtype, AreaLocation):
-                queryset = sorted(queryset, key=AreaLocation.get_sort_key)
-
-            if issubclass(mapitemtype, DirectedLineGeometryMapItemWithLevel):
-                results.extend(obj.to_shadow_geojson() for obj in queryset)
-
-            results.extend(obj.to_geojson() for obj in queryset)
-
-        return Response(results)
+        return Response(list(get_geometry_features(types, level=level, packages=packages,
+                                                   queryset_filter=partial(filter_queryset_by_access, request))))
 
 
 class PackageViewSet(CachedReadOnlyViewSetMixin, ReadOnlyModelViewSet):
@@ -168,13 +139,16 @@ class LocationViewSet(ViewSet):
     include_package_access = True
 
     def list(self, request, **kwargs):
+        locationgroups = LocationGroup.objects.annotate(arealocation_count=Count('arealocations'))
+        arealocations = AreaLocation.objects.prefetch_related('groups')
+
         locations = []
-        locations += list(filter_queryset_by_access(request, LocationGroup.objects.filter(can_search=True,
-                                                                                          compiled_room=True)))
-        locations += sorted(filter_arealocations_by_access(request, AreaLocation.objects.filter(can_search=True)),
+        locations += list(filter_queryset_by_access(request, locationgroups.filter(can_search=True,
+                                                                                   compiled_room=True)))
+        locations += sorted(filter_arealocations_by_access(request, arealocations.filter(can_search=True)),
                             key=AreaLocation.get_sort_key, reverse=True)
-        locations += list(filter_queryset_by_access(request, LocationGroup.objects.filter(can_search=True,
-                                                                                          compiled_room=False)))
+        locations += list(filter_queryset_by_access(request, locationgroups.filter(can_search=True,
+                                                                                   compiled_room=False)))
         return Response([location.to_location_json() for location in locations])
 
     def retrieve(self, request, name=None, **kwargs):
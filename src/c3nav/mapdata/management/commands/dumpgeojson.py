@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from c3nav.mapdata.models import Level
+from c3nav.mapdata.utils.json import stream_geojson
+from c3nav.mapdata.utils.misc import get_geometry_features
+
+
+class Command(BaseCommand):
+    help = 'Dump all geometries as one GeoJSON FeatureCollection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--level', dest='level', default=None,
+                            help='only dump geometries on this level')
+        parser.add_argument('--output', '-o', dest='output', default=None,
+                            help='write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        level = None
+        if options['level'] is not None:
+            level = Level.objects.filter(name=options['level']).first()
+            if level is None:
+                raise CommandError('Unknown level: %s' % options['level'])
+
+        if options['output'] is None:
+            stream_geojson(get_geometry_features(level=level, iterator=True), sys.stdout)
+        else:
+            with open(options['output'], 'w') as f:
+                stream_geojson(get_geometry_features(level=level, iterator=True), f)
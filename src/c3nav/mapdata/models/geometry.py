@@ -17,8 +17,9 @@ GEOMETRY_MAPITEM_TYPES = OrderedDict()
 class GeometryMapItemMeta(MapItemMeta):
     def __new__(mcs, name, bases, attrs):
         cls = super().__new__(mcs, name, bases, attrs)
+        cls._geojson_type = name.lower()
         if not cls._meta.abstract:
-            GEOMETRY_MAPITEM_TYPES[name.lower()] = cls
+            GEOMETRY_MAPITEM_TYPES[cls._geojson_type] = cls
         return cls
 
 
@@ -27,12 +28,22 @@ class GeometryMapItem(MapItem, metaclass=GeometryMapItemMeta):
     A map feature
     """
     geometry = GeometryField()
+    geometry_area = models.FloatField(null=True, editable=False)
 
     geomtype = None
 
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        self.geometry_area = self.geometry.area
+        self.__dict__.pop('_geojson_mapping', None)
+        super().save(*args, **kwargs)
+
+    @cached_property
+    def _geojson_mapping(self):
+        return mapping(self.geometry)
+
     @classmethod
     def fromfile(cls, data, file_path):
         kwargs = super().fromfile(data, file_path)
@@ -41,28 +52,28 @@ class GeometryMapItem(MapItem, metaclass=GeometryMapItemMeta):
             raise ValueError('missing geometry.')
         try:
             kwargs['geometry'] = shape(data['geometry'])
-        except:
-            raise ValueError(_('Invalid GeoJSON.'))
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(_('Invalid GeoJSON.')) from e
 
         return kwargs
 
     def get_geojson_properties(self):
-        return OrderedDict((
-            ('type', self.__class__.__name__.lower()),
-            ('name', self.name),
-            ('package', self.package.name),
-        ))
+        return {
+            'type': self._geojson_type,
+            'name': self.name,
+            'package': self.package.name,
+        }
 
     def to_geojson(self):
-        return OrderedDict((
-            ('type', 'Feature'),
-            ('properties', self.get_geojson_properties()),
-            ('geometry', format_geojson(mapping(self.geometry), round=False)),
-        ))
+        return {
+            'type': 'Feature',
+            'properties': self.get_geojson_properties(),
+            'geometry': format_geojson(self._geojson_mapping, round=False),
+        }
 
     def tofile(self):
         result = super().tofile()
-        result['geometry'] = format_geojson(mapping(self.geometry))
+        result['geometry'] = format_geojson(self._geojson_mapping)
         return result
 
     def get_shadow_geojson(self):
@@ -120,16 +131,16 @@ class DirectedLineGeometryMapItemWithLevel(GeometryMapItemWithLevel):
     def to_shadow_geojson(self):
         shadow = self.geometry.parallel_offset(0.03, 'right', join_style=JOIN_STYLE.mitre)
         shadow = shadow.buffer(0.019, join_style=JOIN_STYLE.mitre, cap_style=CAP_STYLE.flat)
-        return OrderedDict((
-            ('type', 'Feature'),
-            ('properties', OrderedDict((
-                ('type', 'shadow'),
-                ('original_type', self.__class__.__name__.lower()),
-                ('original_name', self.name),
-                ('level', self.level.name),
-            ))),
-            ('geometry', format_geojson(mapping(shadow), round=False)),
-        ))
+        return {
+            'type': 'Feature',
+            'properties': {
+                'type': 'shadow',
+                'original_type': self._geojson_type,
+                'original_name': self.name,
+                'level': self.level.name,
+            },
+            'geometry': format_geojson(mapping(shadow), round=False),
+        }
 
 
 class Building(GeometryMapItemWithLevel):
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from functools import lru_cache, partial
 
 import numpy as np
 from django.core.cache import cache
@@ -15,6 +16,8 @@ from c3nav.mapdata.models.geometry import GeometryMapItemWithLevel
 
 
 class Location:
+    __slots__ = ()
+
     @property
     def location_id(self):
         raise NotImplementedError
@@ -24,18 +27,26 @@ class Location:
         raise NotImplementedError
 
     def to_location_json(self):
-        return OrderedDict((
-            ('id', self.location_id),
-            ('title', str(self.title)),
-            ('subtitle', str(self.subtitle)),
-        ))
+        return {
+            'id': self.location_id,
+            'title': str(self.title),
+            'subtitle': str(self.subtitle),
+        }
 
 
 # noinspection PyUnresolvedReferences
 class LocationModelMixin(Location):
+    @cached_property
+    def _sorted_titles(self):
+        return OrderedDict(sorted(self.titles.items()))
+
+    def save(self, *args, **kwargs):
+        self.__dict__.pop('_sorted_titles', None)
+        super().save(*args, **kwargs)
+
     def get_geojson_properties(self):
         result = super().get_geojson_properties()
-        result['titles'] = OrderedDict(sorted(self.titles.items()))
+        result['titles'] = self._sorted_titles
         return result
 
     @classmethod
@@ -66,7 +77,7 @@ class LocationModelMixin(Location):
 
     def tofile(self):
         result = super().tofile()
-        result['titles'] = OrderedDict(sorted(self.titles.items()))
+        result['titles'] = self._sorted_titles
         result['can_search'] = self.can_search
         return result
 
@@ -94,13 +105,8 @@ class LocationGroup(LocationModelMixin, MapItem):
         if last_update is None:
             return self._get_in_levels()
 
-        cache_key = 'c3nav__mapdata__locationgroup__in_levels__'+last_update.isoformat()+'__'+self.name,
-        in_levels = cache.get(cache_key)
-        if not in_levels:
-            in_levels = self._get_in_levels()
-            cache.set(cache_key, in_levels, 900)
-
-        return in_levels
+        cache_key = 'c3nav__mapdata__locationgroup__in_levels__'+last_update.isoformat()+'__'+self.name
+        return cache.get_or_set(cache_key, self._get_in_levels, 900)
 
     def _get_in_levels(self):
         level_ids = set()
@@ -118,7 +124,10 @@ class LocationGroup(LocationModelMixin, MapItem):
     def subtitle(self):
         if self.compiled_room:
             return ', '.join(area.title for area in self.get_in_levels())
-        return ungettext_lazy('%d location', '%d locations') % self.arealocations.count()
+        count = getattr(self, 'arealocation_count', None)
+        if count is None:
+            count = self.arealocations.count()
+        return ungettext_lazy('%d location', '%d locations') % count
 
     def __str__(self):
         return self.title
@@ -155,6 +164,7 @@ class AreaLocation(LocationModelMixin, GeometryMapItemWithLevel):
         ('poi', _('Point of Interest')),
     )
     LOCATION_TYPES_ORDER = tuple(name for name, title in LOCATION_TYPES)
+    LOCATION_TYPES_RANK = {name: i for i, name in enumerate(LOCATION_TYPES_ORDER)}
     ROUTING_INCLUSIONS = (
         ('default', _('Default, include if map package is unlocked')),
         ('allow_avoid', _('Included, but allow excluding')),
@@ -185,26 +195,38 @@ class AreaLocation(LocationModelMixin, GeometryMapItemWithLevel):
     def get_in_areas(self):
         last_update = get_last_mapdata_update()
         if last_update is None:
-            return self._get_in_areas()
+            return self._get_in_areas(last_update)
 
-        cache_key = 'c3nav__mapdata__location__in_areas__'+last_update.isoformat()+'__'+self.name,
-        in_areas = cache.get(cache_key)
-        if not in_areas:
-            in_areas = self._get_in_areas()
-            cache.set(cache_key, in_areas, 900)
+        cache_key = 'c3nav__mapdata__location__in_areas__'+last_update.isoformat()+'__'+self.name
+        return cache.get_or_set(cache_key, partial(self._get_in_areas, last_update), 900)
 
-        return in_areas
+    def _get_in_areas(self, last_update):
+        my_area = self.geometry_area if self.geometry_area is not None else self.geometry.area
+        if not my_area:
+            return []
+        minx, miny, maxx, maxy = self.geometry.bounds
 
-    def _get_in_areas(self):
-        my_area = self.geometry.area
+        if last_update is None:
+            candidates = _get_level_arealocations(self.level_id)
+        else:
+            candidates = _get_level_arealocations_cached(self.level_id, last_update)
 
         in_areas = []
         area_location_i = self.get_sort_key(self)
         for location_type in reversed(self.LOCATION_TYPES_ORDER[:area_location_i]):
-            for arealocation in AreaLocation.objects.filter(location_type=location_type, level=self.level):
-                intersection_area = arealocation.geometry.intersection(self.geometry).area
-                if intersection_area and intersection_area / my_area > 0.99:
-                    in_areas.append(arealocation)
+            if location_type not in candidates:
+                continue
+            arealocations, bounds, areas = candidates[location_type]
+
+            # the intersection can not be larger than the intersection of both bounding boxes
+            overlap = (np.maximum(np.minimum(bounds[:, 2], maxx) - np.maximum(bounds[:, 0], minx), 0) *
+                       np.maximum(np.minimum(bounds[:, 3], maxy) - np.maximum(bounds[:, 1], miny), 0))
+
+            # areas that are smaller than 99% of this area can not contain it
+            possible = (areas / my_area > 0.99) & (overlap / my_area > 0.99)
+
+            in_areas.extend(arealocations[i] for i in np.nonzero(possible)[0]
+                            if arealocations[i].geometry.intersection(self.geometry).area / my_area > 0.99)
 
         return in_areas
 
@@ -224,7 +246,7 @@ class AreaLocation(LocationModelMixin, GeometryMapItemWithLevel):
 
     @classmethod
     def get_sort_key(cls, arealocation):
-        return cls.LOCATION_TYPES_ORDER.index(arealocation.location_type)
+        return cls.LOCATION_TYPES_RANK[arealocation.location_type]
 
     @classmethod
     def fromfile(cls, data, file_path):
@@ -284,28 +306,34 @@ class AreaLocation(LocationModelMixin, GeometryMapItemWithLevel):
 
 
 class PointLocation(Location):
+    __slots__ = ('level', 'x', 'y', 'request', 'xy', '_location_id', '_description')
+
     def __init__(self, level: Level, x: int, y: int, request):
         self.level = level
         self.x = x
         self.y = y
         self.request = request
+        self.xy = np.array((x, y))
+        self._location_id = 'c:%s:%d:%d' % (level.name, x*100, y*100)
+        self._description = None
 
-    @cached_property
+    @property
     def location_id(self):
-        return 'c:%s:%d:%d' % (self.level.name, self.x*100, self.y*100)
-
-    @cached_property
-    def xy(self):
-        return np.array((self.x, self.y))
+        return self._location_id
 
-    @cached_property
+    @property
     def description(self):
+        if self._description is None:
+            self._description = self._get_description()
+        return self._description
+
+    def _get_description(self):
         from c3nav.routing.graph import Graph
         graph = Graph.load()
         point = graph.get_nearest_point(self.level, self.x, self.y)
 
         if point is None or (':nonpublic' in point.arealocations and not self.request.c3nav_full_access and
-                             not len(set(self.request.c3nav_access_list) & set(point.arealocations))):
+                             point.arealocations.isdisjoint(self.request.c3nav_access_set)):
             return _('Unreachable Coordinates'), ''
 
         locations = sorted(AreaLocation.objects.filter(name__in=point.arealocations, can_describe=True),
@@ -338,3 +366,27 @@ class PointLocation(Location):
         result['x'] = self.x
         result['y'] = self.y
         return result
+
+
+def _get_level_arealocations(level_id):
+    """
+    get all area locations on a level grouped by location type, with their bounds and areas as numpy arrays
+    :param level_id: primary key of the Level
+    :return: a dict of location_type => (tuple of AreaLocations, bounds array, areas array)
+    """
+    arealocations_by_type = {}
+    for arealocation in AreaLocation.objects.filter(level_id=level_id).select_related('level'):
+        arealocations_by_type.setdefault(arealocation.location_type, []).append(arealocation)
+
+    result = {}
+    for location_type, arealocations in arealocations_by_type.items():
+        bounds = np.array(tuple(arealocation.geometry.bounds for arealocation in arealocations))
+        areas = np.array(tuple((arealocation.geometry_area if arealocation.geometry_area is not None
+                                else arealocation.geometry.area) for arealocation in arealocations))
+        result[location_type] = (tuple(arealocations), bounds, areas)
+    return result
+
+
+@lru_cache(maxsize=32)
+def _get_level_arealocations_cached(level_id, last_update):
+    return _get_level_arealocations(level_id)
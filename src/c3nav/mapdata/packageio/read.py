@@ -11,6 +11,11 @@ from c3nav.mapdata.models import AreaLocation, Elevator, Level, LocationGroup, P
 from c3nav.mapdata.models.geometry import LevelConnector
 from c3nav.mapdata.packageio.const import ordered_models
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 
 class MapdataReader:
     def __init__(self):
@@ -119,7 +124,7 @@ class ReaderItem:
             raise CommandError('Could not read File: %s' % e)
 
         try:
-            self.json_data = json.loads(self.content)
+            self.json_data = json_loads(self.content)
         except json.JSONDecodeError as e:
             raise CommandError('Could not decode JSON: %s' % e)
 
@@ -1,6 +1,6 @@
 import re
 
-from django.db.models import Q
+from django.db.models import Count, Q
 
 from c3nav.access.apply import filter_arealocations_by_access, filter_queryset_by_access
 from c3nav.mapdata.models import AreaLocation, LocationGroup
@@ -38,18 +38,20 @@ def search_location(request, search):
 
     words = search.split(' ')[:10]
 
-    queryset = LocationGroup.objects.filter(can_seach=True, compiled_room=True)
+    locationgroups = LocationGroup.objects.annotate(arealocation_count=Count('arealocations'))
+
+    queryset = locationgroups.filter(can_seach=True, compiled_room=True)
     if isinstance(location, LocationGroup):
         queryset.exclude(name='g:' + location.name)
     results += list(filter_words(filter_queryset_by_access(request, queryset), words)[:10])
 
-    queryset = AreaLocation.objects.filter(can_seach=True)
+    queryset = AreaLocation.objects.filter(can_seach=True).prefetch_related('groups')
     if isinstance(location, AreaLocation):
         queryset.exclude(name=location.name)
     results += sorted(filter_words(filter_arealocations_by_access(request, queryset), words),
                       key=AreaLocation.get_sort_key, reverse=True)
 
-    queryset = LocationGroup.objects.filter(can_seach=True, compiled_room=False)
+    queryset = locationgroups.filter(can_seach=True, compiled_room=False)
     if isinstance(location, LocationGroup):
         queryset.exclude(name='g:'+location.name)
     results += list(filter_words(filter_queryset_by_access(request, queryset), words)[:10])
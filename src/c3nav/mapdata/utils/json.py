@@ -40,6 +40,20 @@ def format_geojson(data, round=True):
     ))
 
 
+def stream_geojson(features, f):
+    """
+    write a GeoJSON FeatureCollection feature by feature, so it never has to be completely in memory
+    :param features: iterable of GeoJSON Feature dicts
+    :param f: a file-like object opened for writing text
+    """
+    f.write('{"type": "FeatureCollection", "features": [')
+    for i, feature in enumerate(features):
+        if i:
+            f.write(',\n')
+        f.write(json.dumps(feature))
+    f.write(']}\n')
+
+
 def round_coordinates(data):
     if isinstance(data, (list, tuple)):
         return tuple(round_coordinates(item) for item in data)
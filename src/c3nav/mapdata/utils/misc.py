@@ -3,9 +3,10 @@ import os
 from django.conf import settings
 from django.db.models import Max, Min
 from shapely.geometry import box
-from shapely.ops import cascaded_union
+from shapely.ops import unary_union
 
-from c3nav.mapdata.models import Package
+from c3nav.mapdata.models import GEOMETRY_MAPITEM_TYPES, AreaLocation, Package
+from c3nav.mapdata.models.geometry import DirectedLineGeometryMapItemWithLevel
 from c3nav.mapdata.utils.cache import cache_result
 
 
@@ -34,8 +35,59 @@ def get_public_private_area(level):
 
     width, height = get_dimensions()
     everything = box(0, 0, width, height)
-    needs_permission = [location.geometry
-                        for location in AreaLocation.objects.filter(routing_inclusion='needs_permission')]
-    public_area = level.public_geometries.areas_and_doors.difference(cascaded_union(needs_permission))
+    needs_permission = AreaLocation.objects.filter(routing_inclusion='needs_permission')
+    needs_permission = tuple(needs_permission.values_list('geometry', flat=True))
+    public_area = level.public_geometries.areas_and_doors.difference(unary_union(needs_permission))
     private_area = everything.difference(public_area)
     return public_area, private_area
+
+
+def get_geometry_features(types=None, level=None, packages=None, queryset_filter=None, iterator=False):
+    """
+    generate the GeoJSON features of all geometries, shadows included
+    :param types: names of the geometry types to include, all types if None
+    :param level: only include geometries on this level
+    :param packages: only include geometries from these packages
+    :param queryset_filter: optional function to further filter the queryset of each geometry type
+    :param iterator: fetch the geometries with queryset.iterator(), so they are not all held in memory at once.
+                     AreaLocations still get loaded completely, because they have to be sorted.
+    """
+    if types is None:
+        types = GEOMETRY_MAPITEM_TYPES.keys()
+
+    for t in types:
+        mapitemtype = GEOMETRY_MAPITEM_TYPES[t]
+        queryset = mapitemtype.objects.all()
+        if packages:
+            queryset = queryset.filter(package__in=packages)
+        if level:
+            if hasattr(mapitemtype, 'level'):
+                queryset = queryset.filter(level=level)
+            elif hasattr(mapitemtype, 'levels'):
+                queryset = queryset.filter(levels=level)
+            else:
+                continue
+        if queryset_filter is not None:
+            queryset = queryset_filter(queryset)
+        queryset = queryset.order_by('name')
+
+        for field_name in ('package', 'level', 'crop_to_level', 'elevator'):
+            if hasattr(mapitemtype, field_name):
+                queryset = queryset.select_related(field_name)
+
+        for field_name in ('levels', ):
+            if hasattr(mapitemtype, field_name):
+                queryset = queryset.prefetch_related(field_name)
+
+        if issubclass(mapitemtype, AreaLocation):
+            queryset = sorted(queryset, key=AreaLocation.get_sort_key)
+        elif iterator:
+            if issubclass(mapitemtype, DirectedLineGeometryMapItemWithLevel):
+                yield from (obj.to_shadow_geojson() for obj in queryset.iterator())
+            yield from (obj.to_geojson() for obj in queryset.iterator())
+            continue
+
+        if issubclass(mapitemtype, DirectedLineGeometryMapItemWithLevel):
+            yield from (obj.to_shadow_geojson() for obj in queryset)
+
+        yield from (obj.to_geojson() for obj in queryset)
@@ -94,11 +94,9 @@ class GraphArea():
 
         return '', ''
 
-    def add_point(self, point):
-        if not self.mpl_clear.contains_point(point.xy):
-            return False
-        self._built_points.append(point)
-        return True
+    def add_points(self, points, coords):
+        contained = self.mpl_clear.contains_points(coords)
+        self._built_points.extend(point for point, is_contained in zip(points, contained) if is_contained)
 
     def finish_build(self):
         self.points = np.array(tuple(point.i for point in self._built_points))
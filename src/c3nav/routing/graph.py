@@ -157,7 +157,7 @@ class Graph:
         if filename is None:
             filename = self.default_filename
         with open(filename, 'wb') as f:
-            pickle.dump(self.serialize(), f)
+            pickle.dump(self.serialize(), f, protocol=pickle.HIGHEST_PROTOCOL)
 
     @classmethod
     def unserialize(cls, data, mtime):
@@ -214,10 +214,8 @@ class Graph:
     def build_routers(self, allowed_ctypes, allow_nonpublic, avoid, include):
         routers = {}
 
-        empty_distances = np.empty(shape=(len(self.level_transfer_points),) * 2, dtype=np.float16)
-        empty_distances[:] = np.inf
-
-        sparse_distances = empty_distances.copy()
+        sparse_distances = np.empty(shape=(len(self.level_transfer_points),) * 2, dtype=np.float16)
+        sparse_distances[:] = np.inf
 
         level_transfers = np.zeros(shape=(len(self.level_transfer_points),) * 2, dtype=np.int16)
         level_transfers[:] = -1
@@ -226,16 +224,17 @@ class Graph:
             routers.update(level.build_routers(allowed_ctypes, allow_nonpublic, avoid, include))
             router = routers[level]
 
-            level_distances = empty_distances.copy()
             in_level_i = np.array(tuple(level.room_transfer_points.index(point)
                                         for point in level.level_transfer_points), dtype=int)
             in_graph_i = np.array(tuple(self.level_transfer_points.index(point)
                                         for point in level.level_transfer_points), dtype=int)
-            level_distances[in_graph_i[:, None], in_graph_i] = router.shortest_paths[in_level_i[:, None], in_level_i]
 
-            better = level_distances < sparse_distances
-            sparse_distances[better] = level_distances[better]
-            level_transfers[better] = i
+            # only look at the level transfer points of this level instead of copying the whole matrix
+            level_distances = router.shortest_paths[in_level_i[:, None], in_level_i].astype(np.float16)
+            better = level_distances < sparse_distances[in_graph_i[:, None], in_graph_i]
+            from_i, to_i = better.nonzero()
+            sparse_distances[in_graph_i[from_i], in_graph_i[to_i]] = level_distances[better]
+            level_transfers[in_graph_i[from_i], in_graph_i[to_i]] = i
 
         g_sparse = csgraph_from_dense(sparse_distances, null_value=np.inf)
         shortest_paths, predecessors = shortest_path(g_sparse, return_predecessors=True)
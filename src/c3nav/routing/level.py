@@ -9,16 +9,17 @@ from PIL import Image, ImageDraw
 from scipy.sparse.csgraph._shortest_path import shortest_path
 from scipy.sparse.csgraph._tools import csgraph_from_dense
 from shapely.geometry import CAP_STYLE, JOIN_STYLE, LineString
+from shapely.strtree import STRtree
 
 from c3nav.access.apply import get_public_packages
 from c3nav.mapdata.utils.geometry import assert_multilinestring, assert_multipolygon
 from c3nav.mapdata.utils.misc import get_public_private_area
 from c3nav.routing.point import GraphPoint
 from c3nav.routing.room import GraphRoom
-from c3nav.routing.utils.base import get_nearest_point
+from c3nav.routing.utils.compat import isin
 from c3nav.routing.utils.coords import coord_angle
-from c3nav.routing.utils.draw import _ellipse_bbox, _line_coords
-from c3nav.routing.utils.mpl import shapely_to_mpl
+from c3nav.routing.utils.draw import _ellipse_bboxes, _image_coords
+from c3nav.routing.utils.mpl import get_paths_extents, shapely_to_mpl
 
 
 class GraphLevel():
@@ -89,6 +90,7 @@ class GraphLevel():
         for stair_line in assert_multilinestring(self.level.geometries.stairs):
             coords = tuple(stair_line.coords)
             self.mpl_stairs += tuple((Path(part), coord_angle(*part)) for part in zip(coords[:-1], coords[1:]))
+        self._built_stairs_extents = get_paths_extents(stair for stair, angle in self.mpl_stairs)
 
     def collect_escalators(self):
         self.mpl_escalatorslopes = ()
@@ -123,6 +125,21 @@ class GraphLevel():
             if room.prepare_build(geometry):
                 self.rooms.append(room)
 
+        self._built_room_tree = STRtree([room._built_geometry for room in self.rooms])
+        self._built_room_indices = {id(room._built_geometry): i for i, room in enumerate(self.rooms)}
+
+    def _rooms_intersecting(self, geometry):
+        """
+        get all rooms that intersect with the given geometry, using the room STRtree to skip non-candidates
+        :param geometry: a shapely geometry
+        :return: a list of GraphRooms, in the same order as self.rooms
+        """
+        if not self.rooms:
+            return []
+        candidates = sorted(self._built_room_indices[id(room_geometry)]
+                            for room_geometry in self._built_room_tree.query(geometry))
+        return [self.rooms[i] for i in candidates if self.rooms[i]._built_prepared_geometry.intersects(geometry)]
+
     def collect_arealocations(self):
         public_packages = get_public_packages()
 
@@ -141,20 +158,25 @@ class GraphLevel():
         self._built_arealocations[':nonpublic'] = private_area
         self._built_excludables[':nonpublic'] = private_area
 
+        room_coords = [[] for room in self.rooms]
+
         # add points inside arealocations to be able to route to its borders
         for excludable in self._built_arealocations.values():
             smaller = excludable.buffer(-0.05, join_style=JOIN_STYLE.mitre)
-            for room in self.rooms:
-                room.add_points_on_rings(assert_multipolygon(smaller))
+            for room, coords in zip(self.rooms, room_coords):
+                coords += room.add_points_on_rings(assert_multipolygon(smaller))
 
         # add points outside excludables so if excluded you can walk around them
         for excludable in self._built_excludables.values():
             for polygon in assert_multipolygon(excludable.buffer(0.28, join_style=JOIN_STYLE.mitre)):
-                for room in self.rooms:
-                    room._add_ring(polygon.exterior, want_left=True)
+                for room, coords in zip(self.rooms, room_coords):
+                    coords += room._add_ring(polygon.exterior, want_left=True)
 
                     for interior in polygon.interiors:
-                        room._add_ring(interior, want_left=False)
+                        coords += room._add_ring(interior, want_left=False)
+
+        for room, coords in zip(self.rooms, room_coords):
+            room.add_points(coords)
 
     def create_doors(self):
         doors = self.level.geometries.doors
@@ -166,15 +188,14 @@ class GraphLevel():
             num_points = 0
             connected_rooms = set()
             points = []
-            for room in self.rooms:
-                if not polygon.intersects(room._built_geometry):
+            for room in self._rooms_intersecting(polygon):
+                subpolygons = assert_multipolygon(polygon.intersection(room._built_geometry))
+                if not subpolygons:
                     continue
 
-                for subpolygon in assert_multipolygon(polygon.intersection(room._built_geometry)):
-                    connected_rooms.add(room)
-                    nearest_point = get_nearest_point(room.clear_geometry, subpolygon.centroid)
-                    point, = room.add_point(nearest_point.coords[0])
-                    points.append(point)
+                connected_rooms.add(room)
+                centroids = np.array(tuple(subpolygon.centroid.coords[0] for subpolygon in subpolygons))
+                points.extend(room.add_points(room.get_nearest_clear_points(centroids)))
 
             if len(points) < 2:
                 print('door with <2 points (%d) detected at (%.2f, %.2f)' % (num_points, center.x, center.y))
@@ -207,15 +228,14 @@ class GraphLevel():
             num_points = 0
             connected_rooms = set()
             points = []
-            for room in self.rooms:
-                if not polygon.intersects(room._built_geometry):
+            for room in self._rooms_intersecting(polygon):
+                subpolygons = assert_multipolygon(polygon.intersection(room._built_geometry))
+                if not subpolygons:
                     continue
 
-                for subpolygon in assert_multipolygon(polygon.intersection(room._built_geometry)):
-                    connected_rooms.add(room)
-                    nearest_point = get_nearest_point(room.clear_geometry, subpolygon.centroid)
-                    point, = room.add_point(nearest_point.coords[0])
-                    points.append(point)
+                connected_rooms.add(room)
+                centroids = np.array(tuple(subpolygon.centroid.coords[0] for subpolygon in subpolygons))
+                points.extend(room.add_points(room.get_nearest_clear_points(centroids)))
 
             if len(points) < 2:
                 print('oneway with <2 points (%d) detected at (%.2f, %.2f)' % (num_points, center.x, center.y))
@@ -239,15 +259,18 @@ class GraphLevel():
         for levelconnector in self.level.levelconnectors.all():
             polygon = levelconnector.geometry
 
-            for room in self.rooms:
-                if not polygon.intersects(room._built_geometry):
+            for room in self._rooms_intersecting(polygon):
+                subpolygons = assert_multipolygon(polygon.intersection(room._built_geometry))
+                if not subpolygons:
                     continue
 
-                for subpolygon in assert_multipolygon(polygon.intersection(room._built_geometry)):
-                    point = subpolygon.centroid
-                    if not point.within(room.clear_geometry):
-                        point = get_nearest_point(room.clear_geometry, point)
-                    point, = room.add_point(point.coords[0])
+                centroids = tuple(subpolygon.centroid for subpolygon in subpolygons)
+                coords = np.array(tuple(centroid.coords[0] for centroid in centroids))
+                outside = np.array(tuple(not room._built_prepared_clear.contains(centroid) for centroid in centroids))
+                if outside.any():
+                    coords[outside] = room.get_nearest_clear_points(coords[outside])
+
+                for point in room.add_points(coords):
                     self.graph.add_levelconnector_point(levelconnector, point)
 
     def create_elevatorlevels(self):
@@ -321,34 +344,34 @@ class GraphLevel():
         height = im.size[1]
         draw = ImageDraw.Draw(im)
 
+        coords = _image_coords(self.graph.points, height)
+
+        transfer_lines = []
         if lines:
             for room in self.rooms:
-                # noinspection PyTypeChecker
-                for ctype, from_i, to_i in np.argwhere(room.distances != np.inf):
-                    draw.line(_line_coords(self.graph.points[room.points[from_i]],
-                                           self.graph.points[room.points[to_i]], height),
-                              fill=self.ctype_colors[room.ctypes[ctype]])
+                if not room.ctypes:
+                    continue
 
-        if points:
-            for point_i in self.points:
-                point = self.graph.points[point_i]
-                draw.ellipse(_ellipse_bbox(point.x, point.y, height), (200, 0, 0))
+                room_points = np.array(room.points, dtype=int)
+                ctypes = room.connections_ctype
+                from_i, to_i = room_points[room.connections_from], room_points[room.connections_to]
+                room_lines = np.hstack((coords[from_i], coords[to_i]))
 
-            for point_i in self.room_transfer_points:
-                point = self.graph.points[point_i]
-                draw.ellipse(_ellipse_bbox(point.x, point.y, height), (0, 0, 255))
+                for ctype, line in zip(ctypes, room_lines.tolist()):
+                    draw.line(line, fill=self.ctype_colors[room.ctypes[ctype]])
 
-            for point_i in self.level_transfer_points:
-                point = self.graph.points[point_i]
-                draw.ellipse(_ellipse_bbox(point.x, point.y, height), (0, 180, 0))
+                # lines starting at room transfer points are drawn again on top of everything else
+                transfer_lines.extend(room_lines[isin(from_i, room.room_transfer_points)].tolist())
 
-        if lines:
-            for room in self.rooms:
-                # noinspection PyTypeChecker
-                for ctype, from_i, to_i in np.argwhere(room.distances != np.inf):
-                    if room.points[from_i] in room.room_transfer_points:
-                        draw.line(_line_coords(self.graph.points[room.points[from_i]],
-                                               self.graph.points[room.points[to_i]], height), fill=(0, 255, 255))
+        if points:
+            for points_i, color in ((self.points, (200, 0, 0)),
+                                    (self.room_transfer_points, (0, 0, 255)),
+                                    (self.level_transfer_points, (0, 180, 0))):
+                for bbox in _ellipse_bboxes(coords[np.array(points_i, dtype=int)]).tolist():
+                    draw.ellipse(bbox, color)
+
+        for line in transfer_lines:
+            draw.line(line, fill=(0, 255, 255))
 
         im.save(graph_filename)
 
@@ -356,10 +379,8 @@ class GraphLevel():
     def build_routers(self, allowed_ctypes, allow_nonpublic, avoid, include):
         routers = {}
 
-        empty_distances = np.empty(shape=(len(self.room_transfer_points),) * 2, dtype=np.float16)
-        empty_distances[:] = np.inf
-
-        sparse_distances = empty_distances.copy()
+        sparse_distances = np.empty(shape=(len(self.room_transfer_points),) * 2, dtype=np.float16)
+        sparse_distances[:] = np.inf
 
         room_transfers = np.zeros(shape=(len(self.room_transfer_points),) * 2, dtype=np.int16)
         room_transfers[:] = -1
@@ -368,15 +389,16 @@ class GraphLevel():
             router = room.build_router(allowed_ctypes, allow_nonpublic, avoid, include)
             routers[room] = router
 
-            room_distances = empty_distances.copy()
             in_room_i = np.array(tuple(room.points.index(point) for point in room.room_transfer_points), dtype=int)
             in_level_i = np.array(tuple(self.room_transfer_points.index(point)
                                         for point in room.room_transfer_points), dtype=int)
 
-            room_distances[in_level_i[:, None], in_level_i] = router.shortest_paths[in_room_i[:, None], in_room_i]
-            better = room_distances < sparse_distances
-            sparse_distances[better] = room_distances[better]
-            room_transfers[better] = i
+            # only look at the room transfer points of this room instead of copying the whole matrix
+            room_distances = router.shortest_paths[in_room_i[:, None], in_room_i].astype(np.float16)
+            better = room_distances < sparse_distances[in_level_i[:, None], in_level_i]
+            from_i, to_i = better.nonzero()
+            sparse_distances[in_level_i[from_i], in_level_i[to_i]] = room_distances[better]
+            room_transfers[in_level_i[from_i], in_level_i[to_i]] = i
 
         g_sparse = csgraph_from_dense(sparse_distances, null_value=np.inf)
         shortest_paths, predecessors = shortest_path(g_sparse, return_predecessors=True)
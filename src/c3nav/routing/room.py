@@ -1,18 +1,22 @@
 from collections import namedtuple
 
 import numpy as np
-from matplotlib.path import Path
+from django.utils.functional import cached_property
+from scipy.sparse import csr_matrix
 from scipy.sparse.csgraph._shortest_path import shortest_path
-from scipy.sparse.csgraph._tools import csgraph_from_dense
+from scipy.spatial import cKDTree
 from shapely.geometry import CAP_STYLE, JOIN_STYLE, LineString
-from shapely.ops import cascaded_union
+from shapely.ops import unary_union
+from shapely.prepared import prep
 
 from c3nav.mapdata.utils.geometry import assert_multilinestring, assert_multipolygon
 from c3nav.routing.area import GraphArea
 from c3nav.routing.connection import GraphConnection
 from c3nav.routing.point import GraphPoint
-from c3nav.routing.utils.coords import get_coords_angles
-from c3nav.routing.utils.mpl import shapely_to_mpl
+from c3nav.routing.utils.cache import LRUCache
+from c3nav.routing.utils.compat import isin
+from c3nav.routing.utils.coords import densify_coords, get_coords_angles, interpolate_coords
+from c3nav.routing.utils.mpl import get_paths_extents, intersecting_extents, shapely_to_mpl
 
 
 class GraphRoom():
@@ -26,16 +30,24 @@ class GraphRoom():
         self.areas = []
         self.points = None
         self.room_transfer_points = None
-        self.distances = np.zeros((1, ))
+        self.connections_from = np.zeros((0, ), dtype=np.int32)
+        self.connections_to = np.zeros((0, ), dtype=np.int32)
+        self.connections_ctype = np.zeros((0, ), dtype=np.uint8)
+        self.distances = np.zeros((0, ), dtype=np.float16)
         self.ctypes = None
         self.excludables = None
 
+        self.router_cache = LRUCache(maxsize=64)
+
     def serialize(self):
         return (
             self.mpl_clear,
             [area.serialize() for area in self.areas],
             self.points,
             self.room_transfer_points,
+            self.connections_from,
+            self.connections_to,
+            self.connections_ctype,
             self.distances,
             self.ctypes,
             self.excludables,
@@ -44,32 +56,55 @@ class GraphRoom():
 
     @classmethod
     def unserialize(cls, level, data):
+        if len(data) != 11:
+            raise ValueError('Graph file is outdated, please rebuild it with manage.py buildgraph.')
         room = cls(level)
         (room.mpl_clear, areas, room.points, room.room_transfer_points,
-         room.distances, room.ctypes, room.excludables, room.excludable_points) = data
+         room.connections_from, room.connections_to, room.connections_ctype, room.distances,
+         room.ctypes, room.excludables, room.excludable_points) = data
         room.areas = tuple(GraphArea(room, *area) for area in areas)
         return room
 
     # Building the Graph
     def prepare_build(self, geometry):
         self._built_geometry = geometry
+        self._built_prepared_geometry = prep(geometry)
         self.clear_geometry = self._built_geometry.buffer(-0.3, join_style=JOIN_STYLE.mitre)
 
         if self.clear_geometry.is_empty:
             return False
+        self._built_prepared_clear = prep(self.clear_geometry)
 
         self._built_points = []
         self._built_is_elevatorlevel = False
 
         self.mpl_clear = shapely_to_mpl(self.clear_geometry.buffer(0.01, join_style=JOIN_STYLE.mitre))
-        self.mpl_stairs = tuple((stair, angle) for stair, angle in self.level.mpl_stairs
-                                if self.mpl_clear.intersects_path(stair, filled=True))
+        self.mpl_stairs = tuple(self.level.mpl_stairs[i]
+                                for i in intersecting_extents(self.level._built_stairs_extents,
+                                                              self.mpl_clear.get_extents())
+                                if self.mpl_clear.intersects_path(self.level.mpl_stairs[i][0], filled=True))
+        self._built_stairs_extents = get_paths_extents(stair for stair, angle in self.mpl_stairs)
         self._built_escalators = tuple(escalator for escalator in self.level._built_escalators
                                        if self.mpl_clear.intersects_path(escalator.mpl_geom.exterior, filled=True))
 
         self.isolated_areas = []
         return True
 
+    @cached_property
+    def clear_boundary_kdtree(self):
+        rings = sum(((polygon.exterior, ) + tuple(polygon.interiors)
+                     for polygon in assert_multipolygon(self.clear_geometry)), ())
+        return cKDTree(np.vstack(tuple(densify_coords(ring.coords, 0.05) for ring in rings)))
+
+    def get_nearest_clear_points(self, coords):
+        """
+        get the nearest points on the border of the clear geometry, accurate to a few centimeters
+        :param coords: numpy array of (x, y) coordinates
+        :return: numpy array of (x, y) coordinates
+        """
+        distances, indices = self.clear_boundary_kdtree.query(coords)
+        return self.clear_boundary_kdtree.data[indices]
+
     def build_areas(self):
         stairs_areas = self.level.level.geometries.stairs
         stairs_areas = stairs_areas.buffer(0.3, join_style=JOIN_STYLE.mitre, cap_style=CAP_STYLE.flat)
@@ -80,7 +115,7 @@ class GraphRoom():
         escalators_areas = escalators_areas.intersection(self._built_geometry)
         self._built_isolated_areas += tuple(assert_multipolygon(escalators_areas))
 
-        escalators_and_stairs = cascaded_union((stairs_areas, escalators_areas))
+        escalators_and_stairs = unary_union((stairs_areas, escalators_areas))
 
         isolated_areas = tuple(assert_multipolygon(stairs_areas.intersection(self.clear_geometry)))
         isolated_areas += tuple(assert_multipolygon(escalators_areas.intersection(self.clear_geometry)))
@@ -88,8 +123,9 @@ class GraphRoom():
 
         for isolated_area in isolated_areas:
             mpl_clear = shapely_to_mpl(isolated_area.buffer(0.01, join_style=JOIN_STYLE.mitre))
-            mpl_stairs = tuple((stair, angle) for stair, angle in self.mpl_stairs
-                               if mpl_clear.intersects_path(stair, filled=True))
+            mpl_stairs = tuple(self.mpl_stairs[i]
+                               for i in intersecting_extents(self._built_stairs_extents, mpl_clear.get_extents())
+                               if mpl_clear.intersects_path(self.mpl_stairs[i][0], filled=True))
             escalators = tuple(escalator for escalator in self._built_escalators
                                if escalator.mpl_geom.intersects_path(mpl_clear.exterior, filled=True))
             area = GraphArea(self, mpl_clear, mpl_stairs, escalators)
@@ -103,13 +139,15 @@ class GraphRoom():
         if geometry.is_empty:
             return
 
+        coords = []
+
         # points with 60cm distance to borders
         polygons = assert_multipolygon(geometry)
         for polygon in polygons:
-            self._add_ring(polygon.exterior, want_left=False)
+            coords += self._add_ring(polygon.exterior, want_left=False)
 
             for interior in polygon.interiors:
-                self._add_ring(interior, want_left=True)
+                coords += self._add_ring(interior, want_left=True)
 
         # now fill in missing doorways or similar
         accessible_clear_geometry = geometry.buffer(0.31, join_style=JOIN_STYLE.mitre)
@@ -120,87 +158,81 @@ class GraphRoom():
             if overlaps.is_empty:
                 continue
 
-            points = []
-
             # overlaps to non-missing areas
             overlaps = assert_multipolygon(overlaps)
             for overlap in overlaps:
-                points += self.add_point(overlap.centroid.coords[0])
+                coords.append(overlap.centroid.coords[0])
 
-            points += self._add_ring(polygon.exterior, want_left=False)
+            coords += self._add_ring(polygon.exterior, want_left=False)
 
             for interior in polygon.interiors:
-                points += self._add_ring(interior, want_left=True)
+                coords += self._add_ring(interior, want_left=True)
 
         # points around steps
-        self.add_points_on_rings(self._built_isolated_areas)
+        coords += self.add_points_on_rings(self._built_isolated_areas)
+
+        self.add_points(coords)
 
     def _add_ring(self, geom, want_left):
         """
-        add the points of a ring, but only those that have a specific direction change.
+        get the points of a ring, but only those that have a specific direction change.
         additionally removes unneeded points if the neighbors can be connected in self.clear_geometry
         :param geom: LinearRing
         :param want_left: True if the direction has to be left, False if it has to be right
+        :return: list of (x, y) coordinates
         """
+        ring_coords, is_left = get_coords_angles(geom)
+        wanted = is_left == want_left
+        follows_skipped = np.concatenate(((False, ), ~wanted[:-1]))
+
         coords = []
-        skipped = False
         can_delete_last = False
-        for coord, is_left in get_coords_angles(geom):
-            if is_left != want_left:
-                skipped = True
-                continue
-
+        for coord, skipped in zip(ring_coords[wanted].tolist(), follows_skipped[wanted]):
             if not skipped and can_delete_last and len(coords) >= 2:
-                if LineString((coords[-2], coord)).within(self.clear_geometry):
+                if self._built_prepared_clear.contains(LineString((coords[-2], coord))):
                     coords[-1] = coord
                     continue
 
             coords.append(coord)
             can_delete_last = not skipped
-            skipped = False
 
-        if not skipped and can_delete_last and len(coords) >= 3:
-            if LineString((coords[-2], coords[0])).within(self.clear_geometry):
+        if len(coords) >= 3 and wanted[-1] and can_delete_last:
+            if self._built_prepared_clear.contains(LineString((coords[-2], coords[0]))):
                 coords.pop()
 
-        points = []
-        for coord in coords:
-            points += self.add_point(coord)
-
-        return points
+        return coords
 
     def add_points_on_rings(self, areas):
+        """
+        get points along the rings of the given areas, with about one meter distance between them
+        :param areas: iterable of Polygons
+        :return: list of (x, y) coordinates
+        """
+        result = []
         for polygon in areas:
             for ring in (polygon.exterior,) + tuple(polygon.interiors):
                 for linestring in assert_multilinestring(ring.intersection(self.clear_geometry)):
                     coords = tuple(linestring.coords)
-                    if len(coords) == 2:
-                        path = Path(coords)
-                        length = abs(np.linalg.norm(path.vertices[0] - path.vertices[1]))
-                        for coord in tuple(path.interpolated(int(length / 1.0 + 1)).vertices):
-                            self.add_point(coord)
+                    if len(coords) < 2:
                         continue
+                    result.extend(interpolate_coords(coords, 1.0))
+        return result
 
-                    start = 0
-                    for segment in zip(coords[:-1], coords[1:]):
-                        path = Path(segment)
-                        length = abs(np.linalg.norm(path.vertices[0] - path.vertices[1]))
-                        if length < 1.0:
-                            coords = (path.vertices[1 if start == 0 else 0],)
-                        else:
-                            coords = tuple(path.interpolated(int(length / 1.0 + 0.5)).vertices)[start:]
-                        for coord in coords:
-                            self.add_point(coord)
-                        start = 1
-
-    def add_point(self, coord):
-        if not self.mpl_clear.contains_point(coord):
+    def add_points(self, coords):
+        """
+        add multiple points at once, testing all of them against the clear area in one go
+        :param coords: iterable of (x, y) coordinates
+        :return: list of added GraphPoints
+        """
+        coords = np.array(coords, dtype=float).reshape((-1, 2))
+        if not len(coords):
             return []
-        point = GraphPoint(coord[0], coord[1], self)
-        self._built_points.append(point)
+        coords = coords[self.mpl_clear.contains_points(coords)]
+        points = [GraphPoint(x, y, self) for x, y in coords.tolist()]
+        self._built_points.extend(points)
         for area in self.areas:
-            area.add_point(point)
-        return [point]
+            area.add_points(points, coords)
+        return points
 
     def build_connections(self):
         if self._built_is_elevatorlevel:
@@ -210,7 +242,7 @@ class GraphRoom():
             area.build_connections()
 
     def connection_count(self):
-        return np.count_nonzero(self.distances >= 0)
+        return len(self.distances)
 
     def finish_build(self):
         self.areas = tuple(self.areas)
@@ -223,43 +255,44 @@ class GraphRoom():
         self.room_transfer_points = tuple(i for i in self.points if i in self.level.room_transfer_points)
         self.excludables = tuple(self.excludables)
 
-        excludable_points = list()
-        for excludable in self.excludables:
-            points = self.level.arealocation_points[excludable]
-            excludable_points.append(np.array(tuple((i in points) for i in self.points)))
-        self.excludable_points = np.array(excludable_points)
+        points = np.array(self.points, dtype=int)
+        self.excludable_points = np.array(tuple(isin(points, self.level.arealocation_points[excludable])
+                                                for excludable in self.excludables),
+                                          dtype=bool).reshape((len(self.excludables), len(points)))
 
         mapping = {point.i: i for i, point in enumerate(self._built_points)}
 
-        empty = np.empty(shape=(len(self._built_points), len(self._built_points)), dtype=np.float16)
-        empty[:] = np.inf
-
-        ctypes = []
-        distances = {}
+        # connections are stored as parallel arrays, each pair of points has at most one connection
+        ctypes = {}
+        connections_from = []
+        connections_to = []
+        connections_ctype = []
+        distances = []
         for from_point in self._built_points:
             for to_point, connection in from_point.connections.items():
                 if to_point.i in mapping:
-                    if connection.ctype not in distances:
-                        ctypes.append(connection.ctype)
-                        distances[connection.ctype] = empty.copy()
-                    distances[connection.ctype][mapping[from_point.i], mapping[to_point.i]] = connection.distance
-
-        self.ctypes = tuple(ctypes)
-        self.distances = np.array(tuple(distances[ctype] for ctype in ctypes))
+                    connections_from.append(mapping[from_point.i])
+                    connections_to.append(mapping[to_point.i])
+                    connections_ctype.append(ctypes.setdefault(connection.ctype, len(ctypes)))
+                    distances.append(connection.distance)
+
+        # sorted by origin and destination, so get_connection can use a binary search
+        order = np.lexsort((connections_to, connections_from))
+        self.ctypes = tuple(sorted(ctypes, key=ctypes.get))
+        self.connections_from = np.array(connections_from, dtype=np.int32)[order]
+        self.connections_to = np.array(connections_to, dtype=np.int32)[order]
+        self.connections_ctype = np.array(connections_ctype, dtype=np.uint8)[order]
+        self.distances = np.array(distances, dtype=np.float16)[order]
 
         for area in self.areas:
             area.finish_build()
 
     # Routing
-    router_cache = {}
-
     def build_router(self, allowed_ctypes, allow_nonpublic, avoid, include):
         ctypes = tuple(i for i, ctype in enumerate(self.ctypes) if ctype in allowed_ctypes)
         avoid = tuple(i for i, excludable in enumerate(self.excludables) if excludable in avoid)
         include = tuple(i for i, excludable in enumerate(self.excludables) if excludable in include)
-        cache_key = ('c3nav__graph__roomrouter__%s__%s__%s__%d__%s__%s' %
-                     (self.graph.mtime, self.i, ','.join(str(i) for i in ctypes),
-                      allow_nonpublic, ','.join(str(i) for i in avoid), ','.join(str(i) for i in include)))
+        cache_key = (ctypes, bool(allow_nonpublic), avoid, include)
 
         roomrouter = self.router_cache.get(cache_key)
         if not roomrouter:
@@ -268,36 +301,46 @@ class GraphRoom():
         return roomrouter
 
     def _build_router(self, ctypes, allow_nonpublic, avoid, include):
-        ctype_factors = np.ones((len(self.ctypes), 1, 1))*1000
-        ctype_factors[ctypes, :, :] = 1
+        ctype_factors = np.full((len(self.ctypes), ), 1000, dtype=np.float32)
+        ctype_factors[np.array(ctypes, dtype=int)] = 1
 
-        distances = np.amin(self.distances*ctype_factors, axis=0).astype(np.float32)
-        factors = np.ones_like(distances, dtype=np.float16)
+        # factors are stored per point, a connection gets the higher factor of its two points
+        point_factors = np.ones((len(self.points), ), dtype=np.float32)
 
         if ':nonpublic' in self.excludables and ':nonpublic' not in include:
-            points, = self.excludable_points[self.excludables.index(':nonpublic')].nonzero()
-            factors[points[:, None], :] = 1000 if allow_nonpublic else np.inf
-            factors[:, points] = 1000 if allow_nonpublic else np.inf
+            nonpublic = self.excludable_points[self.excludables.index(':nonpublic')]
+            point_factors[nonpublic] = 1000 if allow_nonpublic else np.inf
 
         if avoid:
-            points, = self.excludable_points[avoid, :].any(axis=0).nonzero()
-            factors[points[:, None], :] = np.maximum(factors[points[:, None], :], 1000)
-            factors[:, points] = np.maximum(factors[:, points], 1000)
+            avoided = self.excludable_points[avoid, :].any(axis=0)
+            np.maximum(point_factors, 1000, out=point_factors, where=avoided)
 
-        if include:
-            points, = self.excludable_points[include, :].any(axis=0).nonzero()
-            factors[points[:, None], :] = 1
-            factors[:, points] = 1
+        factors = np.maximum(point_factors[self.connections_from], point_factors[self.connections_to])
 
-        g_sparse = csgraph_from_dense(distances*factors, null_value=np.inf)
-        shortest_paths, predecessors = shortest_path(g_sparse, return_predecessors=True)
+        if include:
+            included = self.excludable_points[include, :].any(axis=0)
+            factors[included[self.connections_from] | included[self.connections_to]] = 1
+
+        # there is only one connection per pair of points, so no minimum over ctypes has to be taken
+        weights = self.distances.astype(np.float32)
+        weights *= ctype_factors[self.connections_ctype]
+        weights *= factors
+        connections = np.isfinite(weights)
+
+        g_sparse = csr_matrix((weights[connections],
+                               (self.connections_from[connections], self.connections_to[connections])),
+                              shape=(len(self.points), len(self.points)))
+        shortest_paths, predecessors = shortest_path(g_sparse, method='D', directed=True, return_predecessors=True)
         return RoomRouter(shortest_paths, predecessors)
 
+    @cached_property
+    def _connection_keys(self):
+        return self.connections_from.astype(np.int64) * len(self.points) + self.connections_to
+
     def get_connection(self, from_i, to_i):
-        stack = self.distances[:, from_i, to_i]
-        min_i = stack.argmin()
-        distance = stack[min_i]
-        ctype = self.ctypes[min_i]
+        connection_i = np.searchsorted(self._connection_keys, from_i * len(self.points) + to_i)
+        distance = self.distances[connection_i]
+        ctype = self.ctypes[self.connections_ctype[connection_i]]
         return GraphConnection(self.graph.points[self.points[from_i]], self.graph.points[self.points[to_i]],
                                distance=distance, ctype=ctype)
 
@@ -306,15 +349,31 @@ class GraphRoom():
 
     def connected_points(self, point, mode):
         connections = {}
-        for area in self.areas:
+        for area in self._areas_around(point):
             if area.contains_point(point):
                 connections.update(area.connected_points(point, mode))
         return connections
 
+    @cached_property
+    def _area_bboxes(self):
+        return np.array(tuple(area.mpl_clear.get_extents().extents for area in self.areas)).reshape((-1, 4))
+
+    def _areas_around(self, *points):
+        """
+        get the areas whose bounding boxes contain all of the given points
+        :param points: (x, y) coordinates
+        :return: generator of GraphAreas
+        """
+        bboxes = self._area_bboxes
+        mask = np.ones((len(bboxes), ), dtype=bool)
+        for x, y in points:
+            mask &= (bboxes[:, 0] <= x) & (x <= bboxes[:, 2]) & (bboxes[:, 1] <= y) & (y <= bboxes[:, 3])
+        return (self.areas[i] for i in np.nonzero(mask)[0])
+
     def check_connection(self, from_point, to_point):
         from_point = np.array(from_point)
         to_point = np.array(to_point)
-        for area in self.areas:
+        for area in self._areas_around(from_point, to_point):
             if area.contains_point(from_point) and area.contains_point(to_point):
                 there, back = area.check_connection(from_point, to_point)
                 if there is not None:
@@ -0,0 +1,4 @@
+import numpy as np
+
+# np.isin was added in numpy 1.13, np.in1d was removed in numpy 2.4
+isin = getattr(np, 'isin', None) or np.in1d
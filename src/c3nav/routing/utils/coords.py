@@ -1,19 +1,17 @@
 from math import atan2, degrees
 
+import numpy as np
+
 
 def cleanup_coords(coords):
     """
-    remove coordinates that are closer than 0.01 (1cm)
-    :param coords: list of (x, y) coordinates
-    :return: list of (x, y) coordinates
+    remove coordinates that are closer than 0.01 (1cm) to their predecessor
+    :param coords: list or numpy array of (x, y) coordinates
+    :return: numpy array of (x, y) coordinates
     """
-    result = []
-    last_coord = coords[-1]
-    for coord in coords:
-        if ((coord[0] - last_coord[0]) ** 2 + (coord[1] - last_coord[1]) ** 2) ** 0.5 >= 0.01:
-            result.append(coord)
-        last_coord = coord
-    return result
+    coords = np.asarray(coords, dtype=float).reshape((-1, 2))
+    vectors = coords - np.roll(coords, 1, axis=0)
+    return coords[np.hypot(vectors[:, 0], vectors[:, 1]) >= 0.01]
 
 
 def coord_angle(coord1, coord2):
@@ -30,22 +28,54 @@ def get_coords_angles(geom):
     """
     inspects all coordinates of a LinearRing counterclockwise and checks if they are a left or a right turn.
     :param geom: LinearRing
-    :rtype: a list of ((x, y), is_left) tuples
+    :return: numpy array of (x, y) coordinates and numpy boolean array of whether they are a left turn
     """
-    coords = list(cleanup_coords(geom.coords))
+    coords = cleanup_coords(geom.coords)
     if len(coords) < 3:
-        return []
-    last_coords = coords[-2:]
-    last_angle = coord_angle(last_coords[-2], last_coords[-1])
-    result = []
+        return np.empty((0, 2)), np.empty((0, ), dtype=bool)
+
+    # start with the closing coordinate, like the ring itself does
+    coords = np.roll(coords, 1, axis=0)
+    incoming = coords - np.roll(coords, 1, axis=0)
+    outgoing = np.roll(coords, -1, axis=0) - coords
+    is_left = (incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]) >= 0
+
+    if not geom.is_ccw:
+        is_left = ~is_left
 
-    invert = not geom.is_ccw
+    return coords, is_left
+
+
+def densify_coords(coords, max_distance):
+    """
+    insert coordinates into a line so that no two consecutive coordinates are further apart than max_distance
+    :param coords: list or numpy array of (x, y) coordinates
+    :param max_distance: maximum distance between two consecutive coordinates
+    :return: numpy array of (x, y) coordinates
+    """
+    coords = np.asarray(coords, dtype=float)
+    vectors = np.diff(coords, axis=0)
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    counts = np.maximum(np.ceil(lengths / max_distance).astype(int), 1)
+    return _subdivide_coords(coords, vectors, counts)
+
+
+def interpolate_coords(coords, distance):
+    """
+    insert coordinates into a line so that consecutive coordinates are about distance apart.
+    the original coordinates are kept, segments shorter than distance are not subdivided.
+    :param coords: list or numpy array of (x, y) coordinates
+    :param distance: desired distance between two consecutive coordinates
+    :return: numpy array of (x, y) coordinates
+    """
+    coords = np.asarray(coords, dtype=float)
+    vectors = np.diff(coords, axis=0)
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    counts = np.maximum((lengths / distance + 0.5).astype(int), 1)
+    return _subdivide_coords(coords, vectors, counts)
 
-    for coord in coords:
-        angle = coord_angle(last_coords[-1], coord)
-        angle_diff = (last_angle-angle) % 360
-        result.append((last_coords[-1], (angle_diff < 180) ^ invert))
-        last_coords.append(coord)
-        last_angle = angle
 
-    return result
+def _subdivide_coords(coords, vectors, counts):
+    segments = np.repeat(np.arange(len(vectors)), counts)
+    positions = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / counts[segments]
+    return np.vstack((coords[segments] + vectors[segments] * positions[:, None], coords[-1:]))
@@ -1,13 +1,19 @@
+import numpy as np
 from django.conf import settings
 
 
-def _ellipse_bbox(x, y, height):
-    x *= settings.RENDER_SCALE
-    y *= settings.RENDER_SCALE
-    y = height-y
-    return ((x - 2, y - 2), (x + 2, y + 2))
+def _image_coords(points, height):
+    """
+    convert the coordinates of graph points to image coordinates
+    :param points: sequence of GraphPoints
+    :param height: height of the image
+    :return: numpy array of (x, y) image coordinates
+    """
+    coords = np.array(tuple((point.x, point.y) for point in points), dtype=float).reshape((-1, 2))
+    coords *= settings.RENDER_SCALE
+    coords[:, 1] = height - coords[:, 1]
+    return coords
 
 
-def _line_coords(from_point, to_point, height):
-    return (from_point.x * settings.RENDER_SCALE, height - (from_point.y * settings.RENDER_SCALE),
-            to_point.x * settings.RENDER_SCALE, height - (to_point.y * settings.RENDER_SCALE))
+def _ellipse_bboxes(coords):
+    return np.hstack((coords - 2, coords + 2))
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
 from matplotlib.path import Path
+from matplotlib.transforms import Bbox
 from shapely.geometry import MultiPolygon, Polygon
 
 from c3nav.mapdata.utils.geometry import assert_multipolygon
@@ -15,6 +17,14 @@ class MplPathProxy(ABC):
     def contains_point(self, point):
         pass
 
+    @abstractmethod
+    def contains_points(self, points):
+        pass
+
+    @abstractmethod
+    def get_extents(self):
+        pass
+
 
 class MplMultipolygonPath(MplPathProxy):
     def __init__(self, polygon):
@@ -36,6 +46,15 @@ class MplMultipolygonPath(MplPathProxy):
                 return True
         return False
 
+    def contains_points(self, points):
+        result = np.zeros(len(points), dtype=bool)
+        for polygon in self.polygons:
+            result |= polygon.contains_points(points)
+        return result
+
+    def get_extents(self):
+        return Bbox.union([polygon.get_extents() for polygon in self.polygons])
+
 
 class MplPolygonPath(MplPathProxy):
     def __init__(self, polygon):
@@ -73,6 +92,15 @@ class MplPolygonPath(MplPathProxy):
                 return False
         return True
 
+    def contains_points(self, points):
+        result = self.exterior.contains_points(points)
+        for interior in self.interiors:
+            result &= ~interior.contains_points(points)
+        return result
+
+    def get_extents(self):
+        return self.exterior.get_extents()
+
 
 def shapely_to_mpl(geometry):
     """
@@ -97,3 +125,24 @@ def linearring_to_mpl_path(linearring):
     codes.extend([Path.LINETO] * (len(coords)-1))
     codes.append(Path.CLOSEPOLY)
     return Path(vertices, codes, readonly=True)
+
+
+def get_paths_extents(paths):
+    """
+    get the extents of matplotlib paths
+    :param paths: iterable of matplotlib Paths
+    :return: numpy array of (xmin, ymin, xmax, ymax) rows
+    """
+    return np.array(tuple(path.get_extents().extents for path in paths)).reshape((-1, 4))
+
+
+def intersecting_extents(extents, bbox):
+    """
+    check which extents intersect with a bounding box
+    :param extents: numpy array of (xmin, ymin, xmax, ymax) rows
+    :param bbox: a matplotlib Bbox
+    :return: numpy array of indices of the intersecting extents
+    """
+    xmin, ymin, xmax, ymax = bbox.extents
+    return np.nonzero((extents[:, 0] <= xmax) & (extents[:, 2] >= xmin) &
+                      (extents[:, 1] <= ymax) & (extents[:, 3] >= ymin))[0]